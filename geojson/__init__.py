@@ -11,16 +11,21 @@ try:
 except ImportError:
     import json
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
+import math
 from decimal import Decimal
+from operator import itemgetter
 
 # TODO:
 #  - Support for bounding boxes
-#  - Support for coordinate reference systems
 #  - Collect errors for error reporting
 
 
-__all__ = ['ValidationError', 'GeoJSON', 'Feature', 'FeatureCollection', 'GeometryCollection', 'Point', 'MultiPoint', 'LineString', 'MultiLineString', 'Polygon', 'MultiPolygon', 'loads', 'dumps']
+__all__ = ['ValidationError', 'TransformError', 'GeoJSON', 'Feature', 'FeatureCollection', 'GeometryCollection', 'Point', 'MultiPoint', 'LineString', 'MultiLineString', 'Polygon', 'MultiPolygon', 'loads', 'dumps', 'transform', 'register_transform', 'compute_bbox']
 
 
 class ValidationError(Exception):
@@ -33,6 +38,11 @@ class DecodeError(ValueError):
         self.message = message
 
 
+class TransformError(ValueError):
+    def __init__(self, message):
+        self.message = message
+
+
 classes_by_type = {}
 
 def find_by_type(type):
@@ -61,9 +71,337 @@ def loads(*args, **kwargs):
 
 
 def dumps(obj, *args, **kwargs):
+    """
+    Serializes a GeoJSON object to a JSON string. Any additional arguments are
+    passed on to the JSON encoder.
+
+    If `cache` is true, the JSON of each `Feature` is kept and reused by later
+    calls until the feature changes, so re-serializing a mostly unchanged
+    `FeatureCollection` only encodes the features that changed. Caching is
+    skipped for indented output and positional encoder arguments.
+    """
+    if kwargs.pop('cache', False) and not args and kwargs.get('indent') is None:
+        return obj.to_json(**kwargs)
     return json.dumps(obj.to_dict(), *args, **kwargs)
 
 
+# Coordinate reference systems. An object without a `crs` member uses the
+# default geographic CRS: WGS84 longitude, latitude in decimal degrees.
+
+DEFAULT_CRS = 'EPSG:4326'
+
+EARTH_RADIUS = 6378137.0
+WEB_MERCATOR_EXTENT = math.pi * EARTH_RADIUS
+WEB_MERCATOR_MAX_LATITUDE = 85.0511287798066
+
+crs_aliases = {
+    'OGC:CRS84': 'EPSG:4326',
+    'EPSG:900913': 'EPSG:3857',
+    'EPSG:3785': 'EPSG:3857',
+    'EPSG:102100': 'EPSG:3857',
+}
+
+# The valid range of each axis, keyed by CRS name. Positions in a CRS that is
+# not listed here are not range checked.
+crs_bounds = {
+    'EPSG:4326': (('Longitude', -180.0, 180.0), ('Latitude', -90.0, 90.0)),
+    'EPSG:3857': (('Easting', -WEB_MERCATOR_EXTENT, WEB_MERCATOR_EXTENT),
+                  ('Northing', -WEB_MERCATOR_EXTENT, WEB_MERCATOR_EXTENT)),
+}
+
+transforms = {}
+
+def crs_name(crs):
+    """
+    Returns the normalized name (e.g. "EPSG:4326") of the given `crs` member,
+    which may be a named or EPSG-typed crs object, or just a name. Returns the
+    default CRS for None, and None if the CRS can't be identified.
+    """
+    if crs is None:
+        return DEFAULT_CRS
+    if hasattr(crs, 'get'):
+        properties = crs.get('properties') or {}
+        if crs.get('type') == 'EPSG' and properties.get('code') is not None:
+            name = 'EPSG:%s' % properties['code']
+        else:
+            name = properties.get('name')
+    else:
+        name = crs
+    if not isinstance(name, basestring):
+        return None
+    name = name.upper()
+    if name.startswith('URN:OGC:DEF:CRS:'):
+        # urn:ogc:def:crs:<authority>:<version>:<code>
+        parts = name.split(':')
+        name = '%s:%s' % (parts[4], parts[-1])
+    return crs_aliases.get(name, name)
+
+
+def bounds_for_crs(crs):
+    """
+    Returns the axis bounds of the given `crs` member from `crs_bounds`, or an
+    empty tuple if its positions aren't range checked.
+    """
+    return crs_bounds.get(crs_name(crs), ())
+
+
+def register_transform(src, dst, func):
+    """
+    Registers `func` to reproject coordinates from the `src` to the `dst` CRS.
+
+    The function is called with two lists holding the x and y ordinates of
+    every position being transformed, and must return the transformed x and y
+    ordinates as two sequences of the same length.
+    """
+    transforms[(crs_name(src), crs_name(dst))] = func
+
+
+def wgs84_to_web_mercator(xs, ys):
+    if numpy is not None:
+        xs = numpy.asarray(xs, dtype=float)
+        ys = numpy.clip(numpy.asarray(ys, dtype=float),
+                        -WEB_MERCATOR_MAX_LATITUDE, WEB_MERCATOR_MAX_LATITUDE)
+        return (numpy.radians(xs) * EARTH_RADIUS,
+                numpy.log(numpy.tan(numpy.pi / 4 + numpy.radians(ys) / 2)) * EARTH_RADIUS)
+    radians, log, tan = math.radians, math.log, math.tan
+    quarter_pi = math.pi / 4
+    limit = WEB_MERCATOR_MAX_LATITUDE
+    return ([radians(x) * EARTH_RADIUS for x in xs],
+            [log(tan(quarter_pi + radians(max(-limit, min(limit, y))) / 2)) * EARTH_RADIUS for y in ys])
+
+
+def web_mercator_to_wgs84(xs, ys):
+    if numpy is not None:
+        xs = numpy.asarray(xs, dtype=float)
+        ys = numpy.asarray(ys, dtype=float)
+        return (numpy.degrees(xs / EARTH_RADIUS),
+                numpy.degrees(2 * numpy.arctan(numpy.exp(ys / EARTH_RADIUS)) - numpy.pi / 2))
+    degrees, atan, exp = math.degrees, math.atan, math.exp
+    half_pi = math.pi / 2
+    return ([degrees(x / EARTH_RADIUS) for x in xs],
+            [degrees(2 * atan(exp(y / EARTH_RADIUS)) - half_pi) for y in ys])
+
+
+register_transform('EPSG:4326', 'EPSG:3857', wgs84_to_web_mercator)
+register_transform('EPSG:3857', 'EPSG:4326', web_mercator_to_wgs84)
+
+
+def is_position(coordinates):
+    return len(coordinates) > 0 and not isinstance(coordinates[0], (list, tuple))
+
+
+def flatten_coordinates(coordinates, xs, ys):
+    """
+    Appends the x and y ordinates of every position in a (possibly nested)
+    coordinates array to the `xs` and `ys` lists.
+    """
+    if is_position(coordinates):
+        xs.append(float(coordinates[0]))
+        ys.append(float(coordinates[1]))
+    else:
+        for c in coordinates:
+            flatten_coordinates(c, xs, ys)
+
+
+def rebuild_coordinates(coordinates, positions):
+    """
+    Returns a copy of a (possibly nested) coordinates array with the x and y
+    ordinates of each position replaced by the next pair from the `positions`
+    iterator. Any additional elements of a position are kept.
+    """
+    if is_position(coordinates):
+        x, y = next(positions)
+        return [x, y] + list(coordinates[2:])
+    return [rebuild_coordinates(c, positions) for c in coordinates]
+
+
+def child_objects(obj):
+    """
+    Returns the GeoJSON objects directly contained in a `Feature`,
+    `FeatureCollection` or `GeometryCollection`.
+    """
+    if isinstance(obj, Feature):
+        return [obj.geometry] if obj.geometry is not None else []
+    if isinstance(obj, FeatureCollection):
+        return obj.features or []
+    if isinstance(obj, GeometryCollection):
+        return obj.geometries or []
+    return []
+
+
+def iter_objects(obj):
+    """
+    Yields a GeoJSON object and every object it contains.
+    """
+    yield obj
+    for child in child_objects(obj):
+        for item in iter_objects(child):
+            yield item
+
+
+def iter_geometries(obj, crs=None):
+    """
+    Yields each `Geometry` in a GeoJSON object along with the crs member that
+    applies to it. Objects without a crs member inherit their parent's.
+    """
+    if obj.crs is not None:
+        crs = obj.crs
+    if isinstance(obj, Geometry):
+        yield obj, crs
+    for child in child_objects(obj):
+        for item in iter_geometries(child, crs):
+            yield item
+
+
+def validate_bounds(obj, crs=None):
+    """
+    Raises a `ValidationError` if a position in a GeoJSON object, or in any
+    object held by its fields, is outside the bounds of the coordinate
+    reference system in effect for it. Objects without a crs member inherit
+    the `crs` of their parent.
+    """
+    if obj.crs is not None:
+        crs = obj.crs
+    if isinstance(obj, Geometry) and obj.coordinates is not None:
+        bounds = bounds_for_crs(crs)
+        if bounds:
+            # Valid coordinates nest positions to the same depth, so flatten
+            # them a level at a time.
+            positions = [obj.coordinates]
+            while positions and not is_position(positions[0]):
+                positions = [p for c in positions for p in c]
+            for i, (axis, lower, upper) in enumerate(bounds):
+                if positions:
+                    ordinates = map(itemgetter(i), positions)
+                    least, greatest = min(ordinates), max(ordinates)
+                    if isinstance(least, basestring) or isinstance(greatest, basestring):
+                        # Numeric strings pass as ordinates, but don't compare
+                        # as numbers.
+                        ordinates = map(float, ordinates)
+                        least, greatest = min(ordinates), max(ordinates)
+                    if least < lower or greatest > upper:
+                        raise ValidationError('%s must be between %g and %g.' % (axis, lower, upper))
+    for attrname, field in obj.fields.iteritems():
+        value = getattr(obj, attrname)
+        if value is None:
+            continue
+        if isinstance(field, ObjectField):
+            validate_bounds(value, crs)
+        elif isinstance(field, ListField) and isinstance(field.fld, ObjectField):
+            for child in value:
+                validate_bounds(child, crs)
+
+
+def compute_bbox(obj):
+    """
+    Returns the bounding box, [west, south, east, north], of all of the
+    positions in a GeoJSON object, or None if it has no positions.
+    """
+    xs, ys = [], []
+    for geometry, crs in iter_geometries(obj):
+        if geometry.coordinates is not None:
+            flatten_coordinates(geometry.coordinates, xs, ys)
+    if not xs:
+        return None
+    return [min(xs), min(ys), max(xs), max(ys)]
+
+
+def update_bbox(obj):
+    """
+    Recomputes the `bbox` of a GeoJSON object, and of any object it contains,
+    that has one.
+    """
+    if obj.bbox is not None:
+        bbox = compute_bbox(obj)
+        if bbox is not None:
+            if len(obj.bbox) == 6:
+                # Keep the altitude range of a three dimensional bbox.
+                bbox = bbox[:2] + [obj.bbox[2]] + bbox[2:] + [obj.bbox[5]]
+            obj.bbox = bbox
+    for child in child_objects(obj):
+        update_bbox(child)
+
+
+def transform_coordinates(items, crs):
+    """
+    Takes a list of (coordinates, crs member) pairs and returns a list of the
+    coordinates reprojected to the given CRS.
+
+    The positions of all coordinates sharing a source CRS are transformed in a
+    single batch (vectorized, for the built in transforms, when NumPy is
+    available).
+    """
+    dst = crs_name(crs)
+    if dst is None:
+        raise TransformError('Unknown coordinate reference system: %r' % (crs,))
+
+    results = [coordinates for coordinates, src in items]
+    batches = {}
+    for idx, (coordinates, src) in enumerate(items):
+        batches.setdefault(crs_name(src), []).append(idx)
+
+    for src, indexes in batches.iteritems():
+        if src == dst:
+            continue
+        try:
+            func = transforms[(src, dst)]
+        except KeyError:
+            raise TransformError('No transform registered from %s to %s.' % (src, dst))
+        xs, ys = [], []
+        for idx in indexes:
+            flatten_coordinates(results[idx], xs, ys)
+        xs, ys = func(xs, ys)
+        if hasattr(xs, 'tolist'):
+            xs, ys = xs.tolist(), ys.tolist()
+        positions = iter(zip(xs, ys))
+        for idx in indexes:
+            results[idx] = rebuild_coordinates(results[idx], positions)
+    return results
+
+
+def transform(obj, crs):
+    """
+    Reprojects a GeoJSON object, in place, to the given coordinate reference
+    system and returns it.
+
+    See `transform_coordinates`. The `crs` member of the object, and of any
+    contained object that has its own, is set to a copy of the new CRS and
+    existing bounding boxes are recomputed.
+    """
+    geometries = [(geometry, geometry_crs) for geometry, geometry_crs in iter_geometries(obj)
+                  if geometry.coordinates is not None]
+    coordinates = transform_coordinates([(geometry.coordinates, geometry_crs)
+                                         for geometry, geometry_crs in geometries], crs)
+    for (geometry, geometry_crs), geometry_coordinates in zip(geometries, coordinates):
+        if geometry_coordinates is not geometry.coordinates:
+            geometry.coordinates = geometry_coordinates
+
+    if not hasattr(crs, 'get'):
+        crs = {'type': 'name', 'properties': {'name': crs_name(crs)}}
+    set_crs(obj, crs)
+    obj.crs = copy_crs(crs)
+    update_bbox(obj)
+    return obj
+
+
+def set_crs(obj, crs):
+    if obj.crs is not None:
+        obj.crs = copy_crs(crs)
+    for child in child_objects(obj):
+        set_crs(child, crs)
+
+
+def copy_crs(crs):
+    """
+    Returns a copy of a crs member, so that objects don't share (and can't
+    change each other's) crs through it.
+    """
+    crs = dict(crs)
+    if hasattr(crs.get('properties'), 'get'):
+        crs['properties'] = dict(crs['properties'])
+    return crs
+
+
 class Field(object):
     """
     A member field of a GeoJSON object.
@@ -91,6 +429,7 @@ class Field(object):
 
     def __set__(self, obj, value):
         obj.__dict__[self.attrname] = value
+        obj.changed()
 
     def validate(self, value):
         if value is None and not self.null and self.required:
@@ -179,17 +518,17 @@ class PositionField(Field):
     latitude, altitude for a geographic coordinate system). Any number of
     additional elements are allowed, but their interpretation is not
     standardized.
+
+    Only the form of a position is checked here. `GeoJSON.is_valid` checks
+    that positions are within the bounds of their coordinate reference system
+    (see `validate_bounds`).
     """
     def validate(self, value):
         super(PositionField, self).validate(value)
         if not hasattr(value, '__len__') or len(value) < 2:
             raise ValidationError('Value %s are not valid coordinates' % self.proper_value(value))
         try:
-            lonlat = [float(i) for i in value]
-            if lonlat[1] < -90 or lonlat[1] > 90:
-                raise ValidationError('Latitude must be between -90 and 90.')
-            if lonlat[0] < -180 or lonlat[0] > 180:
-                raise ValidationError('Longitude must be between -180 and 180.')
+            [float(i) for i in value]
         except (TypeError, ValueError):
             raise ValidationError('Value %s are not valid coordinates' % self.proper_value(value))
 
@@ -302,8 +641,25 @@ class GeoJSON(object):
                 field.validate(getattr(self, attrname))
             except ValidationError, e:
                 self.errors.append(e.message)
+        if not self.errors:
+            # Positions are only range checked once they're known to be well
+            # formed.
+            try:
+                validate_bounds(self)
+            except ValidationError, e:
+                self.errors.append(e.message)
         return len(self.errors) == 0
 
+    def changed(self):
+        """
+        Marks the object as changed, discarding any JSON cached by `dumps`.
+
+        This happens automatically when a member is assigned, but must be done
+        by hand after modifying a member in place (e.g. updating a `Feature`'s
+        properties, or the positions of its geometry).
+        """
+        self.__dict__['_revision'] = self.__dict__.get('_revision', 0) + 1
+
     @classmethod
     def from_dict(cls, dct):
         """
@@ -321,14 +677,19 @@ class GeoJSON(object):
                 setattr(obj, attrname, field.decode(dct.get(attrname)))
         return obj
 
-    def to_dict(self):
+    def to_dict(self, exclude=()):
         dct = {}
         for attrname, field in self.fields.iteritems():
+            if attrname in exclude:
+                continue
             value = field.encode(getattr(self, attrname))
             if value is not None or field.required:
                 dct[attrname] = value
         return dct
 
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
 
 class Geometry(GeoJSON):
     """
@@ -366,6 +727,21 @@ class Feature(GeoJSON):
     geometry = ObjectField(Geometry, null=True)
     properties = DictField(null=True)
 
+    def to_json(self, **kwargs):
+        # The cached JSON is valid as long as the feature and every object in
+        # its geometry are the same, unchanged, objects.
+        state = ([(obj, obj.__dict__.get('_revision', 0)) for obj in iter_objects(self)],
+                 sorted(kwargs.items()))
+        cached = self.__dict__.get('_json_cache')
+        if cached is not None and cached[0] == state:
+            return cached[1]
+        fragment = super(Feature, self).to_json(**kwargs)
+        self.__dict__['_json_cache'] = (state, fragment)
+        return fragment
+
+
+FEATURES_PLACEHOLDER = '__geojson_features__'
+
 
 class FeatureCollection(GeoJSON):
     """
@@ -376,6 +752,17 @@ class FeatureCollection(GeoJSON):
     """
     features = ListField(ObjectField(Feature))
 
+    def to_json(self, **kwargs):
+        if not self.features:
+            return super(FeatureCollection, self).to_json(**kwargs)
+        # Encode everything but the features, then splice in the JSON of each
+        # feature (which may be cached) in place of a placeholder.
+        dct = self.to_dict(exclude=('features',))
+        dct['features'] = FEATURES_PLACEHOLDER
+        item_separator = (kwargs.get('separators') or (', ', ': '))[0]
+        features = '[%s]' % item_separator.join([feature.to_json(**kwargs) for feature in self.features])
+        return json.dumps(dct, **kwargs).replace(json.dumps(FEATURES_PLACEHOLDER), features, 1)
+
     def __iter__(self):
         for feature in self.features:
             yield feature
@@ -0,0 +1,216 @@
+"""
+A spatial hash index of `Point` features for radius and nearest neighbour
+searches.
+
+Points are bucketed in a grid of `cell_size` degree cells keyed by their
+longitude and latitude, so inserts are O(1) and a query only looks at the
+cells around it. Distances are great-circle distances in meters.
+"""
+
+import math
+from heapq import heappush, heapreplace
+
+from geojson import Point, transform_coordinates
+
+
+__all__ = ['PointIndex', 'haversine']
+
+
+MEAN_EARTH_RADIUS = 6371008.8
+
+
+def haversine(lon1, lat1, lon2, lat2):
+    """
+    Returns the great-circle distance in meters between two positions given in
+    decimal degrees.
+    """
+    lon1, lat1, lon2, lat2 = map(math.radians, (lon1, lat1, lon2, lat2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + \
+        math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * MEAN_EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+class PointIndex(object):
+    """
+    An index of features with `Point` geometries. Features with any other (or
+    no) geometry are ignored.
+
+    Points in a coordinate reference system other than WGS84 are reprojected
+    to longitude, latitude when they're added, raising a `TransformError` if
+    that isn't possible. A point's CRS is the crs member of its geometry or
+    feature, or else `crs`, which defaults to that of the `FeatureCollection`
+    the index is built from. Queries always take longitude, latitude.
+
+    The `cell_size`, in degrees, should be tuned to the dataset: roughly the
+    radius of a typical query, or small enough that a cell holds a few dozen
+    points.
+    """
+
+    def __init__(self, features=None, cell_size=0.1, crs=None):
+        if crs is None:
+            crs = getattr(features, 'crs', None)
+        self.crs = crs
+        self.cell_size = float(cell_size)
+        # Columns are as close to `cell_size` wide as a whole number of them
+        # around the world allows, so the grid wraps at the antimeridian.
+        self.columns = max(int(round(360 / self.cell_size)), 1)
+        self.column_width = 360.0 / self.columns
+        self.rows = int(math.ceil(180 / self.cell_size))
+        self.cells = {}
+        self.count = 0
+        if features is not None:
+            self.extend(features)
+
+    def __len__(self):
+        return self.count
+
+    def cell(self, lon, lat):
+        """
+        Returns the (column, row) of the cell containing a position.
+        """
+        column = int(math.floor((lon + 180) / self.column_width)) % self.columns
+        row = min(max(int(math.floor((lat + 90) / self.cell_size)), 0), self.rows - 1)
+        return column, row
+
+    def append(self, feature):
+        """
+        Adds a feature to the index.
+        """
+        self.extend([feature])
+
+    def extend(self, features):
+        """
+        Adds features to the index, reprojecting all of the points that need it
+        in a single batch.
+        """
+        points = []
+        items = []
+        for feature in features:
+            geometry = feature.geometry
+            if isinstance(geometry, Point) and geometry.coordinates:
+                crs = geometry.crs
+                if crs is None:
+                    crs = feature.crs if feature.crs is not None else self.crs
+                points.append(feature)
+                items.append((geometry.coordinates, crs))
+
+        for feature, coordinates in zip(points, transform_coordinates(items, 'EPSG:4326')):
+            lon, lat = float(coordinates[0]), float(coordinates[1])
+            column, row = self.cell(lon, lat)
+            lat = math.radians(lat)
+            entry = (math.radians(lon), lat, math.cos(lat), feature)
+            self.cells.setdefault(row * self.columns + column, []).append(entry)
+            self.count += 1
+
+    def ring(self, column, row, r):
+        """
+        Yields the keys of the cells `r` cells away from the given one.
+        """
+        if r == 0:
+            yield row * self.columns + column
+            return
+        for y in xrange(max(row - r, 0), min(row + r, self.rows - 1) + 1):
+            if abs(y - row) == r:
+                xs = xrange(column - r, column + r + 1)
+            else:
+                xs = (column - r, column + r)
+            for x in xs:
+                yield y * self.columns + x % self.columns
+
+    def ring_distance(self, lat, r):
+        """
+        Returns a lower bound of the distance from a position at latitude
+        `lat` to any point in a cell more than `r` cells away from its own.
+        """
+        gap = math.radians(min(r * min(self.cell_size, self.column_width), 180))
+        lat = math.radians(min(90, abs(lat) + (r + 1) * self.cell_size))
+        return MEAN_EARTH_RADIUS * min(gap, 2 * math.asin(math.cos(lat) * math.sin(gap / 2)))
+
+    def within(self, lon, lat, radius):
+        """
+        Returns a list of (distance, feature) pairs for the features within
+        `radius` meters of a position, nearest first.
+        """
+        distance = float(radius) / MEAN_EARTH_RADIUS
+        dlat = math.degrees(distance)
+        lat_rad = math.radians(lat)
+        rows = xrange(self.cell(lon, lat - dlat)[1], self.cell(lon, lat + dlat)[1] + 1)
+        if distance >= math.pi / 2 - abs(lat_rad):
+            columns = xrange(self.columns)
+        else:
+            dlon = math.degrees(math.asin(math.sin(distance) / math.cos(lat_rad)))
+            first = int(math.floor((lon - dlon + 180) / self.column_width))
+            last = int(math.floor((lon + dlon + 180) / self.column_width))
+            if last - first + 1 >= self.columns:
+                columns = xrange(self.columns)
+            else:
+                columns = [x % self.columns for x in xrange(first, last + 1)]
+
+        if len(rows) * len(columns) > len(self.cells):
+            buckets = self.cells.itervalues()
+        else:
+            buckets = (self.cells.get(y * self.columns + x, ()) for y in rows for x in columns)
+
+        lon_rad, cos_lat = math.radians(lon), math.cos(lat_rad)
+        sin, asin, sqrt = math.sin, math.asin, math.sqrt
+        # Compare haversine terms rather than distances, to skip the asin.
+        limit = sin(min(distance, math.pi) / 2) ** 2
+        found = []
+        for bucket in buckets:
+            for entry in bucket:
+                a = sin((entry[1] - lat_rad) / 2) ** 2 + cos_lat * entry[2] * sin((entry[0] - lon_rad) / 2) ** 2
+                if a <= limit:
+                    found.append((2 * MEAN_EARTH_RADIUS * asin(min(1.0, sqrt(a))), entry[3]))
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def nearest(self, lon, lat, k=1, max_radius=None):
+        """
+        Returns a list of (distance, feature) pairs for the `k` features
+        nearest to a position, optionally no more than `max_radius` meters
+        away, nearest first.
+
+        Cells are searched in rings of increasing size around the position
+        until no unsearched cell can hold anything nearer than the k-th
+        nearest feature found.
+        """
+        column, row = self.cell(lon, lat)
+        lon_rad = math.radians(lon)
+        lat_rad = math.radians(lat)
+        cos_lat = math.cos(lat_rad)
+        sin, asin, sqrt = math.sin, math.asin, math.sqrt
+
+        heap = []
+        seen = set()
+
+        def search(bucket):
+            for entry in bucket:
+                a = sin((entry[1] - lat_rad) / 2) ** 2 + cos_lat * entry[2] * sin((entry[0] - lon_rad) / 2) ** 2
+                d = 2 * MEAN_EARTH_RADIUS * asin(min(1.0, sqrt(a)))
+                if max_radius is not None and d > max_radius:
+                    continue
+                if len(heap) < k:
+                    heappush(heap, (-d, id(entry), entry[3]))
+                elif d < -heap[0][0]:
+                    heapreplace(heap, (-d, id(entry), entry[3]))
+
+        if k > 0:
+            for r in xrange(max(self.rows, self.columns // 2 + 1) + 1):
+                if 8 * r > len(self.cells):
+                    # The ring has more cells than are occupied, so it's
+                    # quicker to search the remaining occupied cells.
+                    for key, bucket in self.cells.iteritems():
+                        if key not in seen:
+                            search(bucket)
+                    break
+                for key in self.ring(column, row, r):
+                    if key not in seen:
+                        seen.add(key)
+                        search(self.cells.get(key, ()))
+                bound = self.ring_distance(lat, r)
+                if len(heap) == k and bound >= -heap[0][0]:
+                    break
+                if max_radius is not None and bound > max_radius:
+                    break
+
+        return [(-d, feature) for d, _, feature in sorted(heap, reverse=True)]
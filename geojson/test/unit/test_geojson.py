@@ -3,10 +3,11 @@ import random
 import geojson
 
 from decimal import Decimal as D
+from geojson import json
 
 class TestGeoJSON(unittest.TestCase):
     def assertDictEquals(self, dict1, dict2):
-        self.assertTrue(dict1.keys() == dict2.keys())
+        self.assertEquals(set(dict1.keys()), set(dict2.keys()))
         for k, v in dict1.iteritems():
             if type(v) is dict:
                 self.assertDictEquals(v, dict2[k])
@@ -229,11 +230,155 @@ class TestGeoJSON(unittest.TestCase):
         self.assertEquals(point.coordinates, [D('0.0'), D('0.0')])
         self.assertEquals(geojson.dumps(point), s)
         
+    def test_custom_field_validate(self):
+        class EvenField(geojson.Field):
+            def validate(self, value):
+                super(EvenField, self).validate(value)
+                if value % 2:
+                    raise geojson.ValidationError('Value %r is odd' % value)
+
+        class EvensField(geojson.ListField):
+            def validate(self, value):
+                super(EvensField, self).validate(value)
+
+        class Evens(geojson.GeoJSON):
+            numbers = EvensField(EvenField())
+            number = EvenField()
+            point = geojson.ObjectField(geojson.Point, null=True)
+
+        evens = Evens(numbers=[2, 4], number=6, crs={"type": "name", "properties": {"name": "EPSG:3857"}})
+        self.assertTrue(evens.is_valid())
+        evens.numbers.append(5)
+        self.assertFalse(evens.is_valid())
+        evens.numbers.pop()
+        evens.point = geojson.Point(coordinates=[1000000, 2000000])
+        self.assertTrue(evens.is_valid())
+        evens.crs = None
+        self.assertFalse(evens.is_valid())
+        self.assertEquals(evens.errors, ['Longitude must be between -180 and 180.'])
+
+    def test_cached_dumps(self):
+        feature_collection = geojson.FeatureCollection(features=[
+            geojson.Feature(id=i, properties={"n": i}, geometry=geojson.Point(coordinates=[i, i]))
+            for i in xrange(3)])
+        feature_collection.bbox = [0, 0, 2, 2]
+        s = geojson.dumps(feature_collection, cache=True)
+        self.assertEquals(json.loads(s), json.loads(geojson.dumps(feature_collection)))
+        self.assertTrue(geojson.dumps(feature_collection, cache=True) is not s)
+        self.assertEquals(geojson.dumps(feature_collection, cache=True), s)
+
+        # Encoding is only redone for features that have changed.
+        fragment = feature_collection[0].to_json()
+        self.assertTrue(feature_collection[0].to_json() is fragment)
+        feature_collection[1].properties = {"n": "changed"}
+        feature_collection[2].geometry.coordinates = [5, 5]
+        feature_collection[0].properties["n"] = "in place"
+        self.assertTrue(feature_collection[0].to_json() is fragment)
+        feature_collection[0].changed()
+        self.assertEquals(json.loads(geojson.dumps(feature_collection, cache=True)),
+                          json.loads(geojson.dumps(feature_collection)))
+
+        # Changes to the members of a feature's GeometryCollection count too.
+        geometries = geojson.GeometryCollection(geometries=[geojson.Point(coordinates=[1, 2])])
+        feature_collection.append(geojson.Feature(id=3, properties=None, geometry=geometries))
+        geojson.dumps(feature_collection, cache=True)
+        geometries.geometries[0].coordinates = [9, 9]
+        self.assertEquals(json.loads(geojson.dumps(feature_collection, cache=True)),
+                          json.loads(geojson.dumps(feature_collection)))
+        geometries.append(geojson.Point(coordinates=[3, 4]))
+        self.assertEquals(json.loads(geojson.dumps(feature_collection, cache=True)),
+                          json.loads(geojson.dumps(feature_collection)))
+
+        # The cache is keyed on the encoder options.
+        s = geojson.dumps(feature_collection, cache=True, separators=(',', ':'))
+        self.assertEquals(json.loads(s), json.loads(geojson.dumps(feature_collection)))
+        self.assertFalse(' ' in s.replace('in place', ''))
+        self.assertEquals(geojson.dumps(geojson.FeatureCollection(features=[]), cache=True),
+                          geojson.dumps(geojson.FeatureCollection(features=[])))
+
     def test_null_value(self):
         s = '{"geometry": {"type": "Point", "coordinates": [-121.48699999999999, 38.577300000000001]}, "properties": {"body": "Sacto 9-1-1: Sacramento child killer among inmates up for parole hearings", "layer": "com.simplegeo.global.fwix", "url": "http://fwix.com/sac/share/c8327dcb32/sacto_9-1-1_sacramento_child_killer_among_inmates_up_for_parole_hearings", "expires": 0, "source": "Sacbee Region", "type": "object", "thumbnail": null}, "type": "Feature", "id": "c8327dcb32", "created": 1267745881}'
         feature = geojson.loads(s)
         self.assertTrue(feature.is_valid())
         self.assertEquals(feature.properties['thumbnail'], None)
 
+    def test_crs_name(self):
+        self.assertEquals(geojson.crs_name(None), 'EPSG:4326')
+        self.assertEquals(geojson.crs_name('epsg:900913'), 'EPSG:3857')
+        self.assertEquals(geojson.crs_name({"type": "name", "properties": {"name": "urn:ogc:def:crs:OGC:1.3:CRS84"}}), 'EPSG:4326')
+        self.assertEquals(geojson.crs_name({"type": "name", "properties": {"name": "urn:ogc:def:crs:EPSG::3857"}}), 'EPSG:3857')
+        self.assertEquals(geojson.crs_name({"type": "EPSG", "properties": {"code": 3857}}), 'EPSG:3857')
+        self.assertEquals(geojson.crs_name({"type": "link", "properties": {"href": "http://example.com/crs/42"}}), None)
+
+    def test_transform(self):
+        data = {
+            "type": "FeatureCollection",
+            "bbox": [-180, -45, 180, 45],
+            "features": [
+                {"type": "Feature", "properties": None,
+                 "geometry": {"type": "Point", "coordinates": [D('180.0'), D('0.0'), D('12.5')]}},
+                {"type": "Feature", "properties": None,
+                 "geometry": {"type": "LineString", "bbox": [-180, -45, 0, 45],
+                              "coordinates": [[D('-180.0'), D('-45.0')], [D('0.0'), D('45.0')]]}},
+            ]
+        }
+        feature_collection = geojson.FeatureCollection.from_dict(data)
+        self.assertTrue(geojson.transform(feature_collection, 'EPSG:3857') is feature_collection)
+        self.assertEquals(geojson.crs_name(feature_collection.crs), 'EPSG:3857')
+        self.assertTrue(feature_collection.is_valid())
+        point = feature_collection[0].geometry
+        self.assertAlmostEquals(point.x, geojson.WEB_MERCATOR_EXTENT)
+        self.assertAlmostEquals(point.y, 0)
+        self.assertEquals(point.z, D('12.5'))
+        linestring = feature_collection[1].geometry
+        self.assertAlmostEquals(linestring.coordinates[1][1], 5621521.486192066, 6)
+        self.assertEquals(linestring.bbox, geojson.compute_bbox(linestring))
+        self.assertEquals(feature_collection.bbox, geojson.compute_bbox(feature_collection))
+        self.assertAlmostEquals(feature_collection.bbox[0], -geojson.WEB_MERCATOR_EXTENT)
+
+        geojson.transform(feature_collection, {"type": "name", "properties": {"name": "urn:ogc:def:crs:OGC:1.3:CRS84"}})
+        self.assertEquals(feature_collection.crs['properties']['name'], 'urn:ogc:def:crs:OGC:1.3:CRS84')
+        self.assertAlmostEquals(linestring.coordinates[0][0], -180)
+        self.assertAlmostEquals(linestring.coordinates[0][1], -45)
+        self.assertAlmostEquals(linestring.bbox[3], 45)
+
+        crs = {"type": "name", "properties": {"name": "EPSG:3857"}}
+        feature_collection[1].geometry.crs = {"type": "name", "properties": {"name": "EPSG:4326"}}
+        geojson.transform(feature_collection, crs)
+        self.assertFalse(feature_collection.crs is crs)
+        self.assertFalse(linestring.crs is crs)
+        self.assertFalse(linestring.crs is feature_collection.crs)
+        self.assertFalse(linestring.crs['properties'] is feature_collection.crs['properties'])
+        linestring.crs['properties']['name'] = 'EPSG:4326'
+        self.assertEquals(crs['properties']['name'], 'EPSG:3857')
+        self.assertEquals(feature_collection.crs['properties']['name'], 'EPSG:3857')
+
+    def test_transform_registered(self):
+        geojson.register_transform('EPSG:4326', 'TEST:SWAPPED', lambda xs, ys: (ys, xs))
+        point = geojson.Point(coordinates=[10, 20])
+        geojson.transform(point, 'test:swapped')
+        self.assertEquals(point.coordinates, [20.0, 10.0])
+        self.assertRaises(geojson.TransformError, lambda: geojson.transform(point, 'EPSG:3857'))
+        self.assertRaises(geojson.TransformError, lambda: geojson.transform(point, {"type": "link"}))
+        del geojson.transforms[('EPSG:4326', 'TEST:SWAPPED')]
+
+    def test_position_crs_bounds(self):
+        point = geojson.Point(coordinates=[1000000, 2000000])
+        self.assertFalse(point.is_valid())
+        point.crs = {"type": "name", "properties": {"name": "EPSG:3857"}}
+        self.assertTrue(point.is_valid())
+        point.coordinates = [1000000, 30000000]
+        self.assertFalse(point.is_valid())
+        self.assertEquals(point.errors, ['Northing must be between -2.00375e+07 and 2.00375e+07.'])
+        feature = geojson.Feature(geometry=geojson.Point(coordinates=[1000000, 2000000]),
+                                  crs={"type": "name", "properties": {"name": "EPSG:3857"}})
+        self.assertTrue(feature.is_valid())
+        feature.crs = {"type": "name", "properties": {"name": "EPSG:27700"}}
+        self.assertTrue(feature.is_valid())
+        point = geojson.Point(coordinates=['100.5', '-5'])
+        self.assertTrue(point.is_valid())
+        point.coordinates = ['100.5', '-95']
+        self.assertFalse(point.is_valid())
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,95 @@
+import unittest
+import random
+import geojson
+
+from geojson.index import PointIndex, haversine
+
+
+class TestPointIndex(unittest.TestCase):
+    def setUp(self):
+        rand = random.Random(1267745881)
+        self.features = [geojson.Feature(id=i, properties=None,
+                                         geometry=geojson.Point(coordinates=[rand.uniform(-180, 180), rand.uniform(-90, 90)]))
+                         for i in xrange(2000)]
+        self.index = PointIndex(self.features, cell_size=5)
+
+    def brute_force(self, lon, lat):
+        return sorted((haversine(lon, lat, f.geometry.x, f.geometry.y), f) for f in self.features)
+
+    def test_haversine(self):
+        self.assertAlmostEquals(haversine(0, 0, 0, 0), 0)
+        self.assertAlmostEquals(haversine(-180, 10, 180, 10), 0, 6)
+        self.assertAlmostEquals(haversine(0, 0, 90, 0), geojson.index.MEAN_EARTH_RADIUS * 3.141592653589793 / 2, 6)
+        self.assertAlmostEquals(haversine(-0.1278, 51.5074, 2.3522, 48.8566) / 1000, 343.5, 0)
+
+    def test_append(self):
+        self.assertEquals(len(self.index), 2000)
+        self.index.append(geojson.Feature(geometry=None, properties=None))
+        self.index.append(geojson.Feature(properties=None, geometry=geojson.LineString(coordinates=[[0, 0], [1, 1]])))
+        self.index.append(geojson.Feature(id='gc', properties=None, geometry=geojson.GeometryCollection(
+            geometries=[geojson.Point(coordinates=[12.34, 56.78]), geojson.Point(coordinates=[12.35, 56.78])])))
+        self.assertEquals(len(self.index), 2000)
+        feature = geojson.Feature(id='new', properties=None, geometry=geojson.Point(coordinates=[12.34, 56.78]))
+        self.index.append(feature)
+        self.assertEquals(len(self.index), 2001)
+        self.assertTrue(self.index.nearest(12.34, 56.78)[0][1] is feature)
+
+    def test_within(self):
+        for lon, lat, radius in [(0, 0, 500000), (179.9, 10, 1000000), (-20, 89, 800000), (45, -45, 1), (0, 0, 30000000)]:
+            expected = [f.id for d, f in self.brute_force(lon, lat) if d <= radius]
+            self.assertEquals([f.id for d, f in self.index.within(lon, lat, radius)], expected)
+
+    def test_nearest(self):
+        for lon, lat in [(0, 0), (-179.9, -30), (120, 88), (33.3, 44.4)]:
+            expected = self.brute_force(lon, lat)
+            found = self.index.nearest(lon, lat, k=10)
+            self.assertEquals([f.id for d, f in found], [f.id for d, f in expected[:10]])
+            self.assertAlmostEquals(found[0][0], expected[0][0])
+        found = self.index.nearest(0, 0, k=10, max_radius=500000)
+        self.assertEquals([f.id for d, f in found], [f.id for d, f in self.brute_force(0, 0) if d <= 500000][:10])
+        self.assertEquals(PointIndex().nearest(0, 0, k=3), [])
+        self.assertEquals(len(self.index.nearest(0, 0, k=5000)), 2000)
+
+    def test_uneven_cells(self):
+        for cell_size in (0.7, 13):
+            index = PointIndex(self.features, cell_size=cell_size)
+            feature = geojson.Feature(id='antimeridian', properties=None, geometry=geojson.Point(coordinates=[-179.8, 0]))
+            index.append(feature)
+            self.features.append(feature)
+            self.assertEquals([f.id for d, f in index.within(179.9, 0, 40000)], ['antimeridian'])
+            self.assertTrue(index.nearest(179.9, 0)[0][1] is feature)
+            for lon, lat in [(179.9, 0), (-179.9, 45), (10, -60)]:
+                expected = self.brute_force(lon, lat)
+                self.assertEquals([f.id for d, f in index.nearest(lon, lat, k=10)], [f.id for d, f in expected[:10]])
+                self.assertEquals([f.id for d, f in index.within(lon, lat, 1500000)],
+                                  [f.id for d, f in expected if d <= 1500000])
+            self.features.pop()
+
+    def test_projected(self):
+        feature_collection = geojson.FeatureCollection(features=[
+            geojson.Feature(id=i, properties=None, geometry=geojson.Point(coordinates=[10 * i, 10 * i]))
+            for i in xrange(5)])
+        geojson.transform(feature_collection, 'EPSG:3857')
+        index = PointIndex(feature_collection)
+        distance, feature = index.nearest(10, 10)[0]
+        self.assertEquals(feature.id, 1)
+        self.assertAlmostEquals(distance, 0, 3)
+        self.assertEquals([f.id for d, f in index.within(20, 20, 10)], [2])
+
+        index = PointIndex(crs='EPSG:3857')
+        index.append(feature_collection[3])
+        self.assertAlmostEquals(index.nearest(30, 30)[0][0], 0, 3)
+        feature = geojson.Feature(properties=None, geometry=geojson.Point(coordinates=[1, 2]),
+                                  crs={"type": "name", "properties": {"name": "EPSG:27700"}})
+        self.assertRaises(geojson.TransformError, lambda: index.append(feature))
+        self.assertEquals(len(index), 1)
+
+    def test_sparse(self):
+        index = PointIndex(cell_size=0.01)
+        feature = geojson.Feature(id=1, properties=None, geometry=geojson.Point(coordinates=[100, 10]))
+        index.append(feature)
+        self.assertTrue(index.nearest(-100, -10)[0][1] is feature)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+import geojson
+
+from geojson.tiles import TileIndex, clip_line, clip_ring
+
+
+class TestTiles(unittest.TestCase):
+    def feature_collection(self):
+        return geojson.FeatureCollection(features=[
+            geojson.Feature(id='point', properties={"name": "Null Island"},
+                            geometry=geojson.Point(coordinates=[45, 45])),
+            geojson.Feature(id='line', properties=None,
+                            geometry=geojson.LineString(coordinates=[[-90, 10], [90, 10]])),
+            geojson.Feature(id='polygon', properties=None,
+                            geometry=geojson.Polygon(coordinates=[[[-10, -10], [10, -10], [10, 10], [-10, 10], [-10, -10]]])),
+            geojson.Feature(id='tiny', properties=None,
+                            geometry=geojson.LineString(coordinates=[[100, -40], [100.001, -40]])),
+        ])
+
+    def test_clip_line(self):
+        line = [(0, 0), (2, 0), (2, 2), (0, 2)]
+        self.assertEquals(clip_line(line, 1, 0, True), [[(1, 0), (2, 0), (2, 2), (1, 2)]])
+        self.assertEquals(clip_line(line, 1, 0, False), [[(0, 0), (1, 0)], [(1, 2), (0, 2)]])
+        self.assertEquals(clip_line(line, 3, 0, True), [])
+
+    def test_clip_ring(self):
+        ring = [(0, 0), (2, 0), (2, 2), (0, 2), (0, 0)]
+        self.assertEquals(clip_ring(ring, 1, 1, False), [(0, 0), (2, 0), (2, 1), (0, 1), (0, 0)])
+        self.assertEquals(clip_ring(ring, 3, 1, True), [])
+
+    def test_get_tile(self):
+        index = TileIndex(self.feature_collection(), max_zoom=4, extent=256, buffer=0)
+        tile = index.get_tile(0, 0, 0)
+        self.assertEquals([feature.id for feature in tile], ['point', 'line', 'polygon'])
+        self.assertEquals(tile[0].geometry.coordinates, [160, 92])
+        self.assertEquals(tile[0].properties, {"name": "Null Island"})
+        self.assertEquals(tile[1].geometry.coordinates, [[64, 121], [192, 121]])
+        self.assertEquals(tile[2].geometry.coordinates, [[[121, 135], [135, 135], [135, 121], [121, 121], [121, 135]]])
+
+        tile = index.get_tile(1, 0, 0)
+        self.assertEquals([feature.id for feature in tile], ['line', 'polygon'])
+        self.assertEquals(tile[1].geometry.coordinates, [[[256, 256], [256, 242], [242, 242], [242, 256], [256, 256]]])
+        self.assertEquals(tile[0].geometry.coordinates, [[128, 242], [256, 242]])
+        self.assertEquals(index.get_tile(1, 0, 0), tile)
+        self.assertEquals(index.get_tile(1, 1, 1).features[0].id, 'polygon')
+        self.assertEquals(index.get_tile(4, 0, 0), None)
+        self.assertEquals(index.get_tile(5, 0, 0), None)
+        self.assertEquals(index.get_tile(1, 2, 0), None)
+
+    def test_min_size(self):
+        index = TileIndex(self.feature_collection(), max_zoom=20, extent=256, buffer=0)
+        self.assertEquals(index.get_tile(2, 3, 2), None)
+        tile = index.get_tile(20, 815559, 651606)
+        self.assertEquals([feature.id for feature in tile], ['tiny'])
+
+    def test_multi_geometries(self):
+        feature_collection = geojson.FeatureCollection(features=[
+            geojson.Feature(id='u', properties=None,
+                            geometry=geojson.LineString(coordinates=[[-100, 10], [100, 10], [100, 20], [-100, 20]])),
+        ])
+        index = TileIndex(feature_collection, max_zoom=1, extent=256, buffer=0)
+        tile = index.get_tile(1, 0, 0)
+        self.assertEquals(tile[0].geometry.type, 'MultiLineString')
+        self.assertEquals(len(tile[0].geometry.coordinates), 2)
+
+    def test_lru(self):
+        index = TileIndex(self.feature_collection(), max_zoom=2, max_tiles=2)
+        index.get_tile(0, 0, 0)
+        index.get_tile(1, 0, 0)
+        index.get_tile(0, 0, 0)
+        index.get_tile(1, 1, 1)
+        self.assertEquals(list(index.recent), [(0, 0, 0), (1, 1, 1)])
+        self.assertEquals(sorted(index.tiles), [(0, 0, 0), (1, 1, 1)])
+
+    def test_drill_down(self):
+        index = TileIndex(self.feature_collection(), max_zoom=4, extent=256, buffer=0)
+        tile = index.get_tile(3, 4, 3)
+        self.assertEquals(list(index.recent), [(0, 0, 0), (1, 1, 0), (2, 2, 1), (3, 4, 3)])
+        self.assertEquals([feature.id for feature in tile], ['line', 'polygon'])
+        self.assertEquals([feature.feature.id for feature in index.tiles[(2, 2, 1)][0]], ['point', 'line', 'polygon'])
+
+        # Siblings are clipped from the cached parent, which is rendered on
+        # request like any other tile.
+        index.features = []
+        self.assertEquals([feature.id for feature in index.get_tile(3, 5, 3)], ['line'])
+        self.assertEquals([feature.id for feature in index.get_tile(1, 1, 0)], ['point', 'line', 'polygon'])
+        self.assertEquals([feature.id for feature in index.get_tile(1, 0, 1)], ['polygon'])
+
+    def test_iter(self):
+        index = TileIndex(self.feature_collection(), max_zoom=3, min_size=0)
+        tiles = dict(index)
+        self.assertEquals(index.tiles, {})
+        for (z, x, y), tile in tiles.iteritems():
+            self.assertEquals([feature.id for feature in tile], [feature.id for feature in index.get_tile(z, x, y)])
+        self.assertEquals(len([key for key in tiles if key[0] == 0]), 1)
+        self.assertEquals(len([key for key in tiles if key[0] == 1]), 4)
+
+    def test_web_mercator(self):
+        feature_collection = geojson.transform(self.feature_collection(), 'EPSG:3857')
+        index = TileIndex(feature_collection, max_zoom=0, extent=256)
+        self.assertEquals(index.get_tile(0, 0, 0)[0].geometry.coordinates, [160, 92])
+
+
+if __name__ == '__main__':
+    unittest.main()
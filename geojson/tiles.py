@@ -0,0 +1,349 @@
+"""
+Slices a `FeatureCollection` into XYZ (slippy map) tiles.
+
+Features are projected to Web Mercator once, then clipped to the bounds of each
+tile (plus a buffer) and converted to tile-local pixel coordinates, with the
+origin at the top left corner of the tile.
+"""
+
+from collections import deque
+
+from geojson import Feature, FeatureCollection, Point, MultiPoint, LineString, \
+        MultiLineString, Polygon, MultiPolygon, WEB_MERCATOR_EXTENT, \
+        iter_geometries, transform_coordinates
+
+
+__all__ = ['TileIndex']
+
+
+# The kind of each geometry type, and the geometry types used for one or many
+# clipped parts of that kind.
+kinds_by_type = {
+    'Point': 'point',
+    'MultiPoint': 'point',
+    'LineString': 'line',
+    'MultiLineString': 'line',
+    'Polygon': 'polygon',
+    'MultiPolygon': 'polygon',
+}
+
+geometry_classes = {
+    'point': (Point, MultiPoint),
+    'line': (LineString, MultiLineString),
+    'polygon': (Polygon, MultiPolygon),
+}
+
+
+class TileFeature(object):
+    """
+    A feature with its geometry projected to the unit square, where (0, 0) is
+    the north west corner of the world and (1, 1) the south east.
+
+    `parts` is a list of points, lines or polygons (lists of rings) depending
+    on the `kind` of geometry, and `size` the largest dimension of the bounding
+    box of the original, unclipped, geometry.
+    """
+
+    def __init__(self, feature, kind, parts, size=None):
+        self.feature = feature
+        self.kind = kind
+        self.parts = parts
+        xs, ys = [], []
+        for x, y in iter_points(kind, parts):
+            xs.append(x)
+            ys.append(y)
+        self.bbox = (min(xs), min(ys), max(xs), max(ys)) if xs else None
+        if size is None and self.bbox is not None:
+            size = max(self.bbox[2] - self.bbox[0], self.bbox[3] - self.bbox[1])
+        self.size = size
+
+    def clip(self, x0, y0, x1, y1):
+        """
+        Returns the feature clipped to the given bounds, or None if nothing
+        of it is left.
+        """
+        if self.bbox is None:
+            return None
+        minx, miny, maxx, maxy = self.bbox
+        if minx >= x0 and maxx <= x1 and miny >= y0 and maxy <= y1:
+            return self
+        if minx > x1 or maxx < x0 or miny > y1 or maxy < y0:
+            return None
+
+        parts = self.parts
+        for k, axis, keep_greater in ((x0, 0, True), (x1, 0, False), (y0, 1, True), (y1, 1, False)):
+            if self.kind == 'point':
+                parts = [p for p in parts if inside(p, k, axis, keep_greater)]
+            elif self.kind == 'line':
+                parts = [clipped for line in parts for clipped in clip_line(line, k, axis, keep_greater)]
+            else:
+                parts = [clip_polygon(polygon, k, axis, keep_greater) for polygon in parts]
+                parts = [polygon for polygon in parts if polygon]
+        if not parts:
+            return None
+        return TileFeature(self.feature, self.kind, parts, self.size)
+
+
+def iter_points(kind, parts):
+    if kind == 'point':
+        return iter(parts)
+    if kind == 'line':
+        return (p for line in parts for p in line)
+    return (p for polygon in parts for ring in polygon for p in ring)
+
+
+def inside(p, k, axis, keep_greater):
+    if keep_greater:
+        return p[axis] >= k
+    return p[axis] <= k
+
+
+def intersect(a, b, k, axis):
+    t = (k - a[axis]) / (b[axis] - a[axis])
+    if axis == 0:
+        return (k, a[1] + (b[1] - a[1]) * t)
+    return (a[0] + (b[0] - a[0]) * t, k)
+
+
+def clip_line(line, k, axis, keep_greater):
+    """
+    Clips a line to one side of an axis-aligned line, returning a list of the
+    parts of it that are left.
+    """
+    parts = []
+    part = []
+    for a, b in zip(line, line[1:]):
+        a_in = inside(a, k, axis, keep_greater)
+        b_in = inside(b, k, axis, keep_greater)
+        if a_in:
+            part.append(a)
+        if a_in != b_in:
+            p = intersect(a, b, k, axis)
+            if not part or part[-1] != p:
+                part.append(p)
+            if a_in:
+                parts.append(part)
+                part = []
+    if line and inside(line[-1], k, axis, keep_greater):
+        part.append(line[-1])
+    parts.append(part)
+    return [clipped for clipped in parts if len(clipped) >= 2]
+
+
+def clip_ring(ring, k, axis, keep_greater):
+    """
+    Clips a closed ring to one side of an axis-aligned line (Sutherland-Hodgman),
+    returning the clipped ring, which is empty if nothing of it is left.
+    """
+    clipped = []
+    for a, b in zip(ring, ring[1:]):
+        a_in = inside(a, k, axis, keep_greater)
+        if a_in:
+            clipped.append(a)
+        if a_in != inside(b, k, axis, keep_greater):
+            clipped.append(intersect(a, b, k, axis))
+    if clipped and clipped[0] != clipped[-1]:
+        clipped.append(clipped[0])
+    if len(clipped) < 4:
+        return []
+    return clipped
+
+
+def clip_polygon(polygon, k, axis, keep_greater):
+    exterior = clip_ring(polygon[0], k, axis, keep_greater)
+    if not exterior:
+        return []
+    holes = [clip_ring(ring, k, axis, keep_greater) for ring in polygon[1:]]
+    return [exterior] + [ring for ring in holes if ring]
+
+
+def project(feature_collection):
+    """
+    Returns a `TileFeature` for each feature in a `FeatureCollection` that has
+    a point, line or polygon geometry.
+    """
+    features = []
+    items = []
+    for feature in feature_collection.features or []:
+        for geometry, crs in iter_geometries(feature, feature_collection.crs):
+            if geometry.coordinates is not None and geometry.type in kinds_by_type:
+                features.append((feature, geometry))
+                items.append((geometry.coordinates, crs))
+
+    tile_features = []
+    scale = 0.5 / WEB_MERCATOR_EXTENT
+    for (feature, geometry), coordinates in zip(features, transform_coordinates(items, 'EPSG:3857')):
+        kind = kinds_by_type[geometry.type]
+        if geometry.type in ('Point', 'LineString', 'Polygon'):
+            coordinates = [coordinates]
+        parts = to_unit(coordinates, scale)
+        tile_feature = TileFeature(feature, kind, parts)
+        if tile_feature.bbox is not None:
+            tile_features.append(tile_feature)
+    return tile_features
+
+
+def to_unit(coordinates, scale):
+    if len(coordinates) and not isinstance(coordinates[0], (list, tuple)):
+        return (0.5 + float(coordinates[0]) * scale, 0.5 - float(coordinates[1]) * scale)
+    return [to_unit(c, scale) for c in coordinates]
+
+
+# Marks a cached tile whose features have been clipped but not yet rendered.
+UNRENDERED = object()
+
+
+class TileIndex(object):
+    """
+    An index of the tiles of a `FeatureCollection` from `min_zoom` to
+    `max_zoom`.
+
+    Tiles are `extent` pixels square, and features are clipped to the tile
+    plus a `buffer` of pixels on each side. Lines and polygons smaller than
+    `min_size` pixels at a zoom level are left out of its tiles. Up to
+    `max_tiles` of the most recently used tiles, including the clipped
+    features of the ancestors of requested tiles, are kept.
+    """
+
+    def __init__(self, feature_collection, min_zoom=0, max_zoom=14, extent=4096,
+                 buffer=64, min_size=1, max_tiles=256):
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.extent = extent
+        self.buffer = buffer
+        self.min_size = min_size
+        self.max_tiles = max_tiles
+        self.features = project(feature_collection)
+        self.tiles = {}
+        # Keys of the cached tiles, least recently used first.
+        self.recent = deque()
+
+    def clip(self, features, z, x, y):
+        n = 1 << z
+        b = float(self.buffer) / self.extent
+        x0, y0, x1, y1 = (x - b) / n, (y - b) / n, (x + 1 + b) / n, (y + 1 + b) / n
+        clipped = []
+        for feature in features:
+            feature = feature.clip(x0, y0, x1, y1)
+            if feature is not None:
+                clipped.append(feature)
+        return clipped
+
+    def render(self, features, z, x, y):
+        """
+        Returns a `FeatureCollection` of the given clipped features in
+        tile-local coordinates, or None if there are none to show.
+        """
+        n = 1 << z
+        extent = self.extent
+        min_size = float(self.min_size) / (n * extent)
+
+        def local(p):
+            return [int(round((p[0] * n - x) * extent)), int(round((p[1] * n - y) * extent))]
+
+        def local_line(line, min_length):
+            positions = []
+            for p in line:
+                p = local(p)
+                if not positions or positions[-1] != p:
+                    positions.append(p)
+            if len(positions) < min_length:
+                return None
+            return positions
+
+        tile_features = []
+        for feature in features:
+            if feature.kind == 'point':
+                parts = [local(p) for p in feature.parts]
+            else:
+                if feature.size < min_size:
+                    continue
+                if feature.kind == 'line':
+                    parts = [local_line(line, 2) for line in feature.parts]
+                    parts = [line for line in parts if line is not None]
+                else:
+                    parts = []
+                    for polygon in feature.parts:
+                        rings = [local_line(ring, 4) for ring in polygon]
+                        if rings[0] is not None:
+                            parts.append([ring for ring in rings if ring is not None])
+            if not parts:
+                continue
+            single, multi = geometry_classes[feature.kind]
+            if len(parts) == 1:
+                geometry = single(coordinates=parts[0])
+            else:
+                geometry = multi(coordinates=parts)
+            tile_features.append(Feature(id=feature.feature.id,
+                                         properties=feature.feature.properties,
+                                         geometry=geometry))
+        if not tile_features:
+            return None
+        return FeatureCollection(features=tile_features)
+
+    def get_tile(self, z, x, y):
+        """
+        Returns a `FeatureCollection` of the features in the given tile, or
+        None if the tile is empty or out of range.
+        """
+        if z < self.min_zoom or z > self.max_zoom or not (0 <= x < 1 << z and 0 <= y < 1 << z):
+            return None
+        key = (z, x, y)
+        if key in self.tiles:
+            features, tile = self.tiles[key]
+        else:
+            features, tile = self.drill_down(z, x, y), UNRENDERED
+        if tile is UNRENDERED:
+            tile = self.render(features, z, x, y)
+        self.cache(key, features, tile)
+        return tile
+
+    def drill_down(self, z, x, y):
+        """
+        Returns the features clipped to the given tile, clipping down from the
+        nearest cached ancestor (whose features have already been clipped to
+        bounds that contain the tile) and caching the clipped features of each
+        tile in between, so that neighbouring tiles can start from them.
+        """
+        features = self.features
+        start = 0
+        for dz in xrange(1, z + 1):
+            ancestor = self.tiles.get((z - dz, x >> dz, y >> dz))
+            if ancestor is not None:
+                features = ancestor[0]
+                start = z - dz + 1
+                break
+        for level in xrange(start, z + 1):
+            dz = z - level
+            features = self.clip(features, level, x >> dz, y >> dz)
+            if level < z:
+                self.cache((level, x >> dz, y >> dz), features, UNRENDERED)
+        return features
+
+    def cache(self, key, features, tile):
+        if key in self.tiles:
+            self.recent.remove(key)
+        self.tiles[key] = (features, tile)
+        self.recent.append(key)
+        while len(self.recent) > self.max_tiles:
+            del self.tiles[self.recent.popleft()]
+
+    def __iter__(self):
+        """
+        Yields ((z, x, y), tile) for every non-empty tile in the index,
+        slicing each zoom level from the features clipped to the one above it.
+        Tiles generated this way are not cached.
+        """
+        stack = [(0, 0, 0, self.clip(self.features, 0, 0, 0))]
+        while stack:
+            z, x, y, features = stack.pop()
+            if z >= self.min_zoom:
+                tile = self.render(features, z, x, y)
+                if tile is not None:
+                    yield (z, x, y), tile
+            if z < self.max_zoom:
+                for cx in (2 * x, 2 * x + 1):
+                    for cy in (2 * y, 2 * y + 1):
+                        children = self.clip(features, z + 1, cx, cy)
+                        if children:
+                            stack.append((z + 1, cx, cy, children))